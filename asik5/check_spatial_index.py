@@ -0,0 +1,73 @@
+import os
+import tempfile
+
+import numpy as np
+
+from spatial_index import SpatialIndex, Box, HalfSpace, Sphere
+
+rng = np.random.default_rng(0)
+verts = rng.normal(size=(20000, 3))
+tris = rng.integers(0, len(verts), size=(10000, 3))
+tris[:, 1:] = np.clip(tris[:, :1] + rng.integers(-20, 20, size=(len(tris), 2)), 0, len(verts) - 1)
+# повторяющиеся координаты проверяют экстремумы при равенствах
+verts[::50, 2] = np.round(verts[::50, 2], 1)
+
+regions = [
+    Box([-0.5, -0.5, -1.0], [0.5, 1.0, 0.2]),
+    HalfSpace([1.0, 0.3, -0.2], 0.1),
+    HalfSpace.from_point([0.0, 0.0, -1.0], [0.0, 0.0, 0.5]),
+    Sphere([0.2, 0.1, 0.0], 0.7),
+    Box([10.0, 10.0, 10.0], [11.0, 11.0, 11.0]),
+]
+
+
+def check(index, items, leaf_size):
+    for region in regions:
+        inside = np.nonzero(region.contains(items))[0]
+        assert np.array_equal(index.query(region), inside), (leaf_size, region)
+        for axis in range(3):
+            for largest in (False, True):
+                idx, value = index.extreme(axis, region, largest)
+                if not len(inside):
+                    assert idx is None
+                    continue
+                coords = items[inside].max(axis=1)[:, axis] if largest else items[inside].min(axis=1)[:, axis]
+                expected = coords.max() if largest else coords.min()
+                assert idx in inside and value == expected, (leaf_size, region, axis, largest)
+
+    for axis in range(3):
+        assert index.extreme(axis)[1] == items[:, :, axis].min()
+        assert index.extreme(axis, largest=True)[1] == items[:, :, axis].max()
+
+    for query in rng.normal(size=(20, 3)):
+        dist = np.sqrt(np.sum((items - query) ** 2, axis=2).min(axis=1))
+        idx, d = index.nearest(query)
+        assert np.isclose(d, dist.min()) and np.isclose(dist[idx], d), leaf_size
+
+
+for leaf_size in (1, 7, 64):
+    check(SpatialIndex(verts, leaf_size), verts[:, None, :], leaf_size)
+    check(SpatialIndex(verts[tris], leaf_size), verts[tris], leaf_size)
+
+index = SpatialIndex(verts)
+path = os.path.join(tempfile.mkdtemp(), 'index')
+index.save(path)
+loaded = SpatialIndex.load(path)
+for name in ('ids', 'points', 'node_range', 'node_children', 'node_lo', 'node_hi', 'node_min_pos', 'node_max_pos'):
+    assert np.array_equal(getattr(loaded, name), getattr(index, name)), name
+assert np.array_equal(SpatialIndex.load(path + '.npz').query(regions[0]), index.query(regions[0]))
+
+empty = SpatialIndex(np.empty((0, 3)))
+assert len(empty.query_box([0, 0, 0], [1, 1, 1])) == 0
+assert empty.extreme(0) == (None, None)
+assert empty.nearest([0, 0, 0]) == (None, np.inf)
+
+for bad in (lambda: SpatialIndex(verts, leaf_size=0), lambda: SpatialIndex([])):
+    try:
+        bad()
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('ожидался ValueError')
+
+print('Все проверки SpatialIndex пройдены')